@@ -3,10 +3,18 @@
 import os
 import streamlit as st
 from streamlit_folium import st_folium
-import pandas as pd
+import numpy as np
 from dotenv import load_dotenv
 
-from utils import parse_route, encode_polyline, search_along_route, generate_map
+from utils import (
+    parse_route_cached,
+    build_route_index_cached,
+    encode_polyline_cached,
+    search_along_route,
+    build_results_frame,
+    generate_map_cached,
+    PLACES_PAGE_SIZE,
+)
 
 # Load environment variables
 load_dotenv()
@@ -50,41 +58,6 @@ with st.sidebar:
 
     search_btn = st.button("Search", type="primary", use_container_width=True)
 
-    st.divider()
-    st.subheader("Filters")
-
-    min_rating = st.slider(
-        "Min Rating",
-        min_value=0.0,
-        max_value=5.0,
-        value=0.0,
-        step=0.5,
-        help="Only show places with this rating or higher"
-    )
-
-    price_filter = st.multiselect(
-        "Price Level",
-        options=["$", "$$", "$$$", "$$$$"],
-        default=[],
-        help="Filter by price (leave empty for all)"
-    )
-
-    open_now_only = st.checkbox(
-        "Open Now",
-        value=False,
-        help="Only show places that are currently open"
-    )
-
-    max_distance_mi = st.slider(
-        "Max Distance from Route",
-        min_value=0.0,
-        max_value=5.0,
-        value=5.0,
-        step=0.1,
-        format="%.1f mi",
-        help="Maximum distance from route in miles"
-    )
-
     st.divider()
 
     if api_key:
@@ -104,6 +77,10 @@ if "results" not in st.session_state:
     st.session_state.results = None
 if "route_points" not in st.session_state:
     st.session_state.route_points = None
+if "route_index" not in st.session_state:
+    st.session_state.route_index = None
+if "results_df" not in st.session_state:
+    st.session_state.results_df = None
 if "filtered_results" not in st.session_state:
     st.session_state.filtered_results = None
 
@@ -111,21 +88,23 @@ if "filtered_results" not in st.session_state:
 if uploaded_file:
     try:
         file_type = uploaded_file.name.split('.')[-1].lower()
-        points = parse_route(uploaded_file.getvalue(), file_type)
+        points = parse_route_cached(uploaded_file.getvalue(), file_type)
         st.session_state.route_points = points
 
-        if len(points) < 2:
+        if points.shape[0] < 2:
             st.error("Route must have at least 2 points")
             st.session_state.route_points = None
         else:
-            st.sidebar.success(f"Route loaded: {len(points)} points")
+            st.session_state.route_index = build_route_index_cached(points)
+            st.sidebar.success(f"Route loaded: {points.shape[0]} points")
     except Exception as e:
         st.error(f"Error parsing route file: {str(e)}")
         st.session_state.route_points = None
+        st.session_state.route_index = None
 
 # Handle search
 if search_btn:
-    if not st.session_state.route_points:
+    if st.session_state.route_points is None:
         st.warning("Please upload a route file first")
     elif not query:
         st.warning("Please enter a search query")
@@ -133,12 +112,19 @@ if search_btn:
         st.warning("Missing API key. Add GOOGLE_API_KEY=your_key to .env file")
     else:
         try:
-            with st.spinner("Encoding route..."):
-                encoded = encode_polyline(st.session_state.route_points)
+            # Multi-page searches encode each route sub-segment themselves
+            encoded = None
+            if max_results <= PLACES_PAGE_SIZE:
+                with st.spinner("Encoding route..."):
+                    encoded = encode_polyline_cached(st.session_state.route_points)
 
             with st.spinner(f"Searching for '{query}' along your route..."):
-                results = search_along_route(encoded, query, api_key, max_results, st.session_state.route_points)
+                results = search_along_route(
+                    encoded, query, api_key, max_results,
+                    st.session_state.route_index, st.session_state.route_points
+                )
                 st.session_state.results = results
+                st.session_state.results_df = build_results_frame(results)
                 st.session_state.results_unfiltered_count = len(results)
 
             if not results:
@@ -152,80 +138,121 @@ if search_btn:
             else:
                 st.error(f"Search error: {error_msg}")
 
-# Display results
-if st.session_state.results:
-    results = st.session_state.results
 
-    # Apply filters
-    filtered_results = []
-    for place in results:
-        # Rating filter
-        if place.get("rating") and place["rating"] < min_rating:
-            continue
-        if min_rating > 0 and not place.get("rating"):
-            continue
+@st.fragment
+def render_results():
+    """Render filters, results table and map.
+
+    Runs as a fragment, so filter changes rerun only this function instead of
+    the whole script (upload parsing, search handling).
+    """
+    # Filters live inside the fragment so changing one reruns only this block
+    if st.session_state.results:
+        st.subheader("Filters")
+        rating_col, price_col, distance_col, open_col = st.columns(4)
+
+        min_rating = rating_col.slider(
+            "Min Rating",
+            min_value=0.0,
+            max_value=5.0,
+            value=0.0,
+            step=0.5,
+            help="Only show places with this rating or higher"
+        )
+
+        price_filter = price_col.multiselect(
+            "Price Level",
+            options=["$", "$$", "$$$", "$$$$"],
+            default=[],
+            help="Filter by price (leave empty for all)"
+        )
+
+        max_distance_mi = distance_col.slider(
+            "Max Distance from Route",
+            min_value=0.0,
+            max_value=5.0,
+            value=5.0,
+            step=0.1,
+            format="%.1f mi",
+            help="Maximum distance from route in miles"
+        )
+
+        open_now_only = open_col.checkbox(
+            "Open Now",
+            value=False,
+            help="Only show places that are currently open"
+        )
+
+        results = st.session_state.results
+
+        # Apply filters as vectorized masks over the results table
+        df = st.session_state.results_df
+        mask = np.ones(len(df), dtype=bool)
+
+        # Rating filter - places without a rating are hidden once a minimum is set
+        if min_rating > 0:
+            mask &= df["rating"].fillna(0).to_numpy() >= min_rating
 
-        # Price filter
-        if price_filter and place.get("price_level") not in price_filter:
-            if place.get("price_level"):  # Skip if has price but not in filter
-                continue
+        # Price filter - places without a price level always pass
+        if price_filter:
+            mask &= (df["price_level"].isin(price_filter) | df["price_level"].fillna("").eq("")).to_numpy()
 
         # Open now filter
-        if open_now_only and place.get("open_now") is not True:
-            continue
+        if open_now_only:
+            mask &= df["open_now"].eq(True).to_numpy()
 
         # Distance filter (convert to miles)
-        if place.get("distance_mi") and place["distance_mi"] > max_distance_mi:
-            continue
+        mask &= ~(df["distance_mi"].fillna(0).to_numpy() > max_distance_mi)
 
-        filtered_results.append(place)
+        filtered_results = df[mask]
 
-    total_count = st.session_state.get("results_unfiltered_count", len(results))
-    if len(filtered_results) < total_count:
-        st.subheader(f"Showing {len(filtered_results)} of {total_count} places")
-    else:
-        st.subheader(f"Found {len(filtered_results)} places")
-
-    if not filtered_results:
-        st.info("No places match your filters. Try adjusting them.")
-    else:
-        # Results table
-        df = pd.DataFrame(filtered_results)
-
-        # Format the dataframe for display
-        display_cols = ["name", "rating", "rating_count", "distance_display", "price_level", "open_now", "address", "maps_url"]
-        available_cols = [c for c in display_cols if c in df.columns]
-
-        st.dataframe(
-            df[available_cols],
-            use_container_width=True,
-            hide_index=True,
-            column_config={
-                "name": "Name",
-                "rating": st.column_config.NumberColumn("Rating", format="%.1f"),
-                "rating_count": st.column_config.NumberColumn("Reviews", format="%d"),
-                "distance_display": "Distance",
-                "price_level": "Price",
-                "open_now": st.column_config.CheckboxColumn("Open", default=False),
-                "address": "Address",
-                "maps_url": st.column_config.LinkColumn("Map", display_text="Open")
-            }
-        )
+        total_count = st.session_state.get("results_unfiltered_count", len(results))
+        if len(filtered_results) < total_count:
+            st.subheader(f"Showing {len(filtered_results)} of {total_count} places")
+        else:
+            st.subheader(f"Found {len(filtered_results)} places")
 
-        # Update session state with filtered results for map
-        st.session_state.filtered_results = filtered_results
-
-# Display map
-if st.session_state.route_points:
-    st.subheader("Map")
-    # Use filtered results if available, otherwise all results
-    map_results = st.session_state.get("filtered_results", st.session_state.results)
-    m = generate_map(st.session_state.route_points, map_results)
-    st_folium(m, width=None, height=600, use_container_width=True)
-elif not uploaded_file:
-    # Show placeholder map centered on Austin
-    st.subheader("Map")
-    st.info("Upload a route file to see it on the map")
-    import folium
-    m = folium.Map(location=[30.2672, -97.7431], zoom_start=11)
-    st_folium(m, width=None, height=400, use_container_width=True)
+        if filtered_results.empty:
+            st.info("No places match your filters. Try adjusting them.")
+        else:
+            # Results table
+            display_cols = ["name", "rating", "rating_count", "distance_display", "price_level", "open_now", "address", "maps_url"]
+
+            st.dataframe(
+                filtered_results[display_cols],
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "name": "Name",
+                    "rating": st.column_config.NumberColumn("Rating", format="%.1f"),
+                    "rating_count": st.column_config.NumberColumn("Reviews", format="%d"),
+                    "distance_display": "Distance",
+                    "price_level": "Price",
+                    "open_now": st.column_config.CheckboxColumn("Open", default=False),
+                    "address": "Address",
+                    "maps_url": st.column_config.LinkColumn("Map", display_text="Open")
+                }
+            )
+
+            # Update session state with filtered results for map
+            st.session_state.filtered_results = filtered_results
+
+    # Display map
+    if st.session_state.route_points is not None:
+        st.subheader("Map")
+        # Use filtered results if available, otherwise all results
+        map_results = st.session_state.filtered_results
+        if map_results is None:
+            map_results = st.session_state.results_df
+        m = generate_map_cached(st.session_state.route_points, map_results)
+        st_folium(m, width=None, height=600, use_container_width=True)
+    elif not uploaded_file:
+        # Show placeholder map centered on Austin
+        st.subheader("Map")
+        st.info("Upload a route file to see it on the map")
+        import folium
+        m = folium.Map(location=[30.2672, -97.7431], zoom_start=11)
+        st_folium(m, width=None, height=400, use_container_width=True)
+
+
+render_results()
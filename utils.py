@@ -1,75 +1,91 @@
 """Utility functions for Route Scout - parsing, encoding, API calls, and map generation."""
 
+import hashlib
 import io
 import math
-from typing import Optional
-import gpxpy
-from pykml import parser as kml_parser
-import polyline
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
+from typing import NamedTuple, Optional
+import numpy as np
+import orjson
+from lxml import etree
+from scipy.spatial import cKDTree
 import requests
+from requests.adapters import HTTPAdapter
 import folium
+from folium.plugins import MarkerCluster
+import pandas as pd
+import streamlit as st
 
 
-def parse_gpx(file_content: bytes) -> list[tuple[float, float]]:
-    """Parse GPX file and return list of (lat, lon) tuples."""
-    gpx = gpxpy.parse(io.BytesIO(file_content))
-    points = []
-
-    # Extract points from tracks
-    for track in gpx.tracks:
-        for segment in track.segments:
-            for point in segment.points:
-                points.append((point.latitude, point.longitude))
-
-    # Also check routes if no tracks found
-    if not points:
-        for route in gpx.routes:
-            for point in route.points:
-                points.append((point.latitude, point.longitude))
-
-    # Also check waypoints
-    if not points:
-        for waypoint in gpx.waypoints:
-            points.append((waypoint.latitude, waypoint.longitude))
-
-    return points
-
+def parse_gpx(file_content: bytes) -> np.ndarray:
+    """Parse GPX file and return an (N, 2) array of (lat, lon).
 
-def parse_kml(file_content: bytes) -> list[tuple[float, float]]:
-    """Parse KML file and return list of (lat, lon) tuples.
+    Reads lat/lon attributes straight off the XML (GPX 1.0 or 1.1) instead of
+    building a full gpxpy object graph.
+    """
+    found = {'trkpt': [], 'rtept': [], 'wpt': []}
+
+    for _, elem in etree.iterparse(
+        io.BytesIO(file_content), events=('end',), tag=('{*}trkpt', '{*}rtept', '{*}wpt')
+    ):
+        lat, lon = elem.get('lat'), elem.get('lon')
+        if lat is not None and lon is not None:
+            found[etree.QName(elem).localname].append((float(lat), float(lon)))
+        elem.clear()
+
+    # Prefer track points, then route points, then waypoints
+    points = found['trkpt'] or found['rtept'] or found['wpt']
+    return np.array(points, dtype=np.float64).reshape(-1, 2)
+
+
+def _parse_kml_coordinates(coord_text: str) -> np.ndarray:
+    """Parse a KML coordinates string of lon,lat[,alt] tuples into an (N, 2) array of (lat, lon)."""
+    tokens = coord_text.split()
+    if not tokens:
+        return np.empty((0, 2), dtype=np.float64)
+
+    # Fast path: every tuple has the same number of components, so the whole
+    # string converts in one NumPy call
+    width = tokens[0].count(',') + 1
+    try:
+        values = np.array(coord_text.replace(',', ' ').split(), dtype=np.float64)
+    except ValueError:
+        values = None
+    if values is not None and width >= 2 and values.size == len(tokens) * width:
+        return values.reshape(-1, width)[:, [1, 0]]  # Swap to lat, lon
+
+    # Irregular tuples - fall back to parsing one at a time
+    coords = []
+    for coord in tokens:
+        parts = coord.split(',')
+        if len(parts) >= 2:
+            lon, lat = float(parts[0]), float(parts[1])
+            coords.append((lat, lon))  # Swap to lat, lon
+    return np.array(coords, dtype=np.float64).reshape(-1, 2)
+
+
+def parse_kml(file_content: bytes) -> np.ndarray:
+    """Parse KML file and return an (N, 2) array of (lat, lon).
 
     Note: KML stores coordinates as lon,lat,alt - we need to swap to lat,lon.
     """
-    root = kml_parser.parse(io.BytesIO(file_content)).getroot()
     points = []
 
-    # Helper to extract coordinates from a coordinates string
-    def extract_coords(coord_text: str) -> list[tuple[float, float]]:
-        coords = []
-        for coord in coord_text.strip().split():
-            parts = coord.split(',')
-            if len(parts) >= 2:
-                lon, lat = float(parts[0]), float(parts[1])
-                coords.append((lat, lon))  # Swap to lat, lon
-        return coords
-
-    # Search for coordinates in various KML structures
-    # Using namespace-agnostic iteration
-    def find_coordinates(element):
-        found = []
-        # Check if this element has coordinates
-        if hasattr(element, 'coordinates'):
-            found.extend(extract_coords(str(element.coordinates)))
-        # Recursively search children
-        for child in element.iterchildren():
-            found.extend(find_coordinates(child))
-        return found
-
-    points = find_coordinates(root)
-    return points
-
-
-def parse_route(file_content: bytes, file_type: str) -> list[tuple[float, float]]:
+    # Stream <coordinates> elements in any namespace, freeing each as we go
+    for _, elem in etree.iterparse(io.BytesIO(file_content), events=('end',), tag='{*}coordinates'):
+        if elem.text:
+            points.append(_parse_kml_coordinates(elem.text))
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+    if not points:
+        return np.empty((0, 2), dtype=np.float64)
+    return np.concatenate(points)
+
+
+def parse_route(file_content: bytes, file_type: str) -> np.ndarray:
     """Dispatch to appropriate parser based on file type."""
     file_type = file_type.lower()
     if file_type == 'gpx':
@@ -80,76 +96,272 @@ def parse_route(file_content: bytes, file_type: str) -> list[tuple[float, float]
         raise ValueError(f"Unsupported file type: {file_type}")
 
 
-def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate distance between two points in meters using Haversine formula."""
-    R = 6371000  # Earth's radius in meters
+@st.cache_data(show_spinner=False)
+def parse_route_cached(file_content: bytes, file_type: str) -> np.ndarray:
+    """Cached parse_route, keyed on file bytes so reruns skip re-parsing."""
+    return parse_route(file_content, file_type)
 
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    delta_phi = math.radians(lat2 - lat1)
-    delta_lambda = math.radians(lon2 - lon1)
 
-    a = math.sin(delta_phi / 2) ** 2 + \
-        math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+def route_to_radians(route_points: np.ndarray) -> np.ndarray:
+    """Convert an (N, 2) route array of (lat, lon) to radians."""
+    return np.radians(np.asarray(route_points, dtype=np.float64))
 
-    return R * c
 
+# Maximum spacing between KD-tree sample points along a route segment, in meters
+INDEX_SPACING_M = 100.0
 
-def distance_from_route(place_lat: float, place_lon: float, route_points: list[tuple[float, float]]) -> float:
-    """Calculate minimum distance from a place to the route in meters."""
-    min_dist = float('inf')
 
-    # Sample every 10th point for performance on long routes
-    step = max(1, len(route_points) // 100)
-    sampled_points = route_points[::step]
+class RouteIndex(NamedTuple):
+    """Route KD-tree over sampled segment points, plus precomputed per-segment deltas."""
+    lon: np.ndarray
+    y: np.ndarray
+    kx: float
+    tree: cKDTree
+    sample_seg: np.ndarray
+    seg_dlon: np.ndarray
+    seg_dy: np.ndarray
+    seg_dlon2: np.ndarray
+    seg_dy2: np.ndarray
 
-    for lat, lon in sampled_points:
-        dist = haversine_distance(place_lat, place_lon, lat, lon)
-        if dist < min_dist:
-            min_dist = dist
 
-    return min_dist
+def _project(rad: np.ndarray, kx: float) -> np.ndarray:
+    """Project an (N, 2) radians (lat, lon) array to equirectangular (x, y) meters."""
+    R = 6371000.0  # Earth's radius in meters
+    return np.column_stack([rad[:, 1] * kx, rad[:, 0] * R])
 
 
-def downsample_points(points: list[tuple[float, float]], max_points: int = 500) -> list[tuple[float, float]]:
+def build_route_index(route_points: np.ndarray) -> RouteIndex:
+    """Project an (N, 2) route of (lat, lon) once and build a KD-tree over it.
+
+    The single projection's east-west scale is only right at the route's
+    mean latitude, so it is used to pick candidate segments, not to measure.
+    Long segments (GPS gaps, joins between tracks) are sampled every
+    INDEX_SPACING_M so no single segment widens every distance query.
+    """
+    R = 6371000.0  # Earth's radius in meters
+
+    route_rad = route_to_radians(route_points)
+    kx = R * math.cos(route_rad[:, 0].mean())
+    xy = _project(route_rad, kx)
+
+    # Place-plane invariants: north-south meters and longitude deltas
+    lon = route_rad[:, 1]
+    y = route_rad[:, 0] * R
+    seg_dlon = np.diff(lon)
+    seg_dy = np.diff(y)
+    seg_dlon2 = seg_dlon ** 2
+    seg_dy2 = seg_dy ** 2
+    seg_dy2[(seg_dlon2 == 0) & (seg_dy2 == 0)] = 1.0  # Repeated points - t collapses to 0
+
+    if len(seg_dy) == 0:
+        # Single point route - the tree holds just that vertex
+        return RouteIndex(
+            lon, y, kx, cKDTree(xy), np.zeros(0, dtype=np.int64), seg_dlon, seg_dy, seg_dlon2, seg_dy2
+        )
+
+    # Sample both endpoints of every segment plus interior points, so each
+    # point on a segment is within INDEX_SPACING_M / 2 of one of its own samples
+    seg_ab = np.diff(xy, axis=0)
+    pieces = np.maximum(1, np.ceil(np.hypot(*seg_ab.T) / INDEX_SPACING_M)).astype(np.int64)
+    sample_seg = np.repeat(np.arange(len(seg_ab)), pieces + 1)
+    starts = np.cumsum(pieces + 1) - (pieces + 1)
+    t = (np.arange(len(sample_seg)) - starts[sample_seg]) / pieces[sample_seg]
+    samples = xy[sample_seg] + t[:, None] * seg_ab[sample_seg]
+
+    return RouteIndex(lon, y, kx, cKDTree(samples), sample_seg, seg_dlon, seg_dy, seg_dlon2, seg_dy2)
+
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def build_route_index_cached(route_points: np.ndarray) -> RouteIndex:
+    """Cached build_route_index, keyed on the route array contents."""
+    return build_route_index(route_points)
+
+
+def _segment_distances(point: np.ndarray, a: np.ndarray, ab: np.ndarray, ab_len2: np.ndarray) -> np.ndarray:
+    """Distances from one (x, y) point to each segment a[i] -> a[i] + ab[i] (ab_len2 nonzero)."""
+    ap = point - a
+    t = np.clip((ap * ab).sum(axis=1) / ab_len2, 0.0, 1.0)
+    return np.hypot(*(ap - t[:, None] * ab).T)
+
+
+def distances_from_route(place_coords: np.ndarray, route_index: RouteIndex) -> np.ndarray:
+    """Minimum distance in meters from each (lat, lon) place to the nearest route segment."""
+    R = 6371000.0  # Earth's radius in meters
+
+    place_rad = np.radians(np.asarray(place_coords, dtype=np.float64).reshape(-1, 2))
+    place_kx = R * np.cos(place_rad[:, 0])
+    place_y = place_rad[:, 0] * R
+
+    def local_xy(i: int, seg: np.ndarray) -> np.ndarray:
+        # Offsets of route vertices from place i in meters, in the plane centered on it
+        return np.column_stack([
+            (route_index.lon[seg] - place_rad[i, 1]) * place_kx[i],
+            route_index.y[seg] - place_y[i]
+        ])
+
+    if len(route_index.seg_dy) == 0:
+        return np.array([np.hypot(*local_xy(i, np.array([0]))[0]) for i in range(len(place_rad))])
+
+    place_xy = _project(place_rad, route_index.kx)
+    sample_dist, _ = route_index.tree.query(place_xy, k=1, workers=-1)
+
+    # Candidates from the route-wide plane: widen by the ratio of east-west
+    # scales so the nearest segment in the place's own plane is always included
+    scale = place_kx / route_index.kx
+    radii = np.maximum(scale, 1 / scale) * sample_dist + INDEX_SPACING_M * 0.5 + 1e-6
+    candidates = route_index.tree.query_ball_point(place_xy, r=radii, workers=-1)
+
+    result = np.empty(len(place_rad))
+    for i, idx in enumerate(candidates):
+        seg = np.unique(route_index.sample_seg[idx])
+        kx2 = place_kx[i] ** 2
+        ab = np.column_stack([route_index.seg_dlon[seg] * place_kx[i], route_index.seg_dy[seg]])
+        ab_len2 = route_index.seg_dlon2[seg] * kx2 + route_index.seg_dy2[seg]
+        result[i] = _segment_distances(np.zeros(2), local_xy(i, seg), ab, ab_len2).min()
+
+    return result
+
+
+def downsample_points(points: np.ndarray, max_points: int = 500) -> np.ndarray:
     """Downsample points to avoid API limits while preserving start/end."""
     if len(points) <= max_points:
         return points
 
-    step = (len(points) - 1) / (max_points - 1)
-    indices = [int(i * step) for i in range(max_points - 1)] + [len(points) - 1]
-    return [points[i] for i in indices]
+    indices = np.linspace(0, len(points) - 1, max_points).astype(np.int64)
+    return points[indices]
+
+
+def rdp_simplify(points: np.ndarray, epsilon_m: float = 10.0) -> np.ndarray:
+    """Simplify an (N, 2) route with Ramer-Douglas-Peucker, preserving start/end.
+
+    Drops points within epsilon_m meters of the chord segment between kept
+    points. Distances use an equirectangular projection centered on each chord,
+    which is accurate enough for route-scale segments.
+    """
+    R = 6371000.0  # Earth's radius in meters
+
+    n = len(points)
+    if n < 3:
+        return points
+
+    rad = np.radians(np.asarray(points, dtype=np.float64))
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        # Project the chord and interior points to meters around the chord midpoint
+        kx = R * math.cos((rad[start, 0] + rad[end, 0]) * 0.5)
+        origin = rad[start]
+        ax, ay = (rad[end, 1] - origin[1]) * kx, (rad[end, 0] - origin[0]) * R
+        px = (rad[start + 1:end, 1] - origin[1]) * kx
+        py = (rad[start + 1:end, 0] - origin[0]) * R
+
+        # Distance to the chord segment, not its infinite line, so points
+        # beyond either end (an out-and-back turnaround) are kept
+        chord2 = ax * ax + ay * ay
+        if chord2 > 0:
+            t = np.clip((px * ax + py * ay) / chord2, 0.0, 1.0)
+            dist = np.hypot(px - t * ax, py - t * ay)
+        else:
+            dist = np.hypot(px, py)
+
+        idx = int(dist.argmax())
+        if dist[idx] > epsilon_m:
+            split = start + 1 + idx
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
 
+    return points[keep]
 
-def encode_polyline(points: list[tuple[float, float]]) -> str:
+
+def encode_polyline(points: np.ndarray) -> str:
     """Encode coordinates to Google polyline format.
 
-    Downsamples if necessary to avoid API limits.
+    Simplifies with rdp_simplify, then downsamples if necessary to avoid API
+    limits. The encoding runs on NumPy arrays rather than per-coordinate
+    Python loops.
     """
-    # Downsample if too many points
+    # Drop near-collinear points, then downsample if still too many
+    points = rdp_simplify(points, epsilon_m=10.0)
     points = downsample_points(points, max_points=500)
+    if len(points) == 0:
+        return ""
 
-    # polyline library expects (lat, lon) tuples which we already have
-    return polyline.encode(points)
+    # Delta-encode the 1e5-scaled coordinates, interleaved lat, lon, lat, ...
+    # Rounds half away from zero, as the reference algorithm does
+    scaled = np.asarray(points, dtype=np.float64) * 1e5
+    scaled = np.copysign(np.floor(np.abs(scaled) + 0.5), scaled).astype(np.int64)
+    deltas = np.diff(scaled, axis=0, prepend=0).ravel()
 
+    # Zigzag so negative deltas encode as odd values
+    values = (deltas << 1) ^ (deltas >> 63)
 
-def search_along_route(
+    # Split each value into 5-bit chunks, low chunk first
+    shifts = np.arange(7, dtype=np.int64) * 5
+    chunks = (values[:, None] >> shifts) & 0x1F
+    n_chunks = 1 + (values[:, None] >= (1 << shifts[1:])).sum(axis=1)
+    keep = np.arange(7) < n_chunks[:, None]
+
+    # Every chunk but the last of a value carries the continuation bit
+    chunks |= np.where(np.arange(7) < (n_chunks - 1)[:, None], 0x20, 0)
+    chunks += 63
+
+    return chunks[keep].astype(np.uint8).tobytes().decode("ascii")
+
+
+@st.cache_data(show_spinner=False)
+def encode_polyline_cached(points: np.ndarray) -> str:
+    """Cached encode_polyline, keyed on the route array contents."""
+    return encode_polyline(points)
+
+
+# Shared session so repeat searches reuse the keep-alive TLS connection
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
+# Most results the Places API returns for a single text search
+PLACES_PAGE_SIZE = 20
+
+# Places API price levels to number of $ signs
+PRICE_LEVELS = {
+    "PRICE_LEVEL_FREE": "Free",
+    "PRICE_LEVEL_INEXPENSIVE": "$",
+    "PRICE_LEVEL_MODERATE": "$$",
+    "PRICE_LEVEL_EXPENSIVE": "$$$",
+    "PRICE_LEVEL_VERY_EXPENSIVE": "$$$$"
+}
+
+
+def _api_key_digest(api_key: str) -> str:
+    """SHA-256 hex digest of an API key, for cache keys."""
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _fetch_places_raw(
     encoded_polyline: str,
     query: str,
-    api_key: str,
-    max_results: int = 20,
-    route_points: Optional[list[tuple[float, float]]] = None
+    _api_key: str,
+    api_key_digest: str,
+    max_results: int = 20
 ) -> list[dict]:
-    """Search for places along route using Google Places API (New).
+    """Call the Places API (New) text search along a route and return raw places.
 
-    Returns list of dicts with: name, address, rating, lat, lon, types, price_level, open_now, distance_from_route
+    Cached for an hour on (polyline, query, api_key_digest, max_results). The
+    leading underscore keeps the key text out of the cache key; its digest
+    keeps entries for different keys apart.
     """
     url = "https://places.googleapis.com/v1/places:searchText"
 
     headers = {
         "Content-Type": "application/json",
-        "X-Goog-Api-Key": api_key,
+        "X-Goog-Api-Key": _api_key,
         "X-Goog-FieldMask": "places.id,places.displayName,places.formattedAddress,places.rating,places.location,places.types,places.userRatingCount,places.priceLevel,places.currentOpeningHours"
     }
 
@@ -163,48 +375,93 @@ def search_along_route(
         }
     }
 
-    response = requests.post(url, json=body, headers=headers)
+    response = _SESSION.post(url, data=orjson.dumps(body), headers=headers)
     response.raise_for_status()
 
-    data = response.json()
-    places = data.get("places", [])
+    data = orjson.loads(response.content)
+    return data.get("places", [])
+
+
+def _fetch_places_split(
+    route_points: np.ndarray,
+    query: str,
+    api_key: str,
+    max_results: int
+) -> list[dict]:
+    """Fetch more than one page of places by searching route sub-segments in parallel.
+
+    Splits the route into one contiguous slice per page needed, searches each
+    concurrently, then merges round-robin and dedupes by place id.
+    """
+    n_segments = min(4, math.ceil(max_results / PLACES_PAGE_SIZE))
+    bounds = np.linspace(0, len(route_points) - 1, n_segments + 1).astype(np.int64)
+    encoded_segments = [
+        encode_polyline(route_points[bounds[i]:bounds[i + 1] + 1])
+        for i in range(n_segments)
+    ]
+
+    key_digest = _api_key_digest(api_key)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        pages = list(pool.map(
+            lambda encoded: _fetch_places_raw(encoded, query, api_key, key_digest, PLACES_PAGE_SIZE),
+            encoded_segments
+        ))
+
+    # Interleave pages so truncation keeps top results from every segment
+    merged = {}
+    for row in zip_longest(*pages):
+        for place in row:
+            if place is not None:
+                merged.setdefault(place.get("id") or id(place), place)
+
+    return list(merged.values())[:max_results]
+
+
+def search_along_route(
+    encoded_polyline: Optional[str],
+    query: str,
+    api_key: str,
+    max_results: int = 20,
+    route_index: Optional[RouteIndex] = None,
+    route_points: Optional[np.ndarray] = None
+) -> list[dict]:
+    """Search for places along route using Google Places API (New).
+
+    When max_results exceeds one API page and route_points is given, the route
+    is split into sub-segments searched in parallel and encoded_polyline is
+    unused (it may be None).
+
+    Returns list of dicts with: id, name, address, rating, rating_count, lat, lon, types, price_raw,
+    open_now, distance_m. Pass them to build_results_frame for display columns.
+    """
+    if max_results > PLACES_PAGE_SIZE and route_points is not None and len(route_points) >= 2:
+        places = _fetch_places_split(route_points, query, api_key, max_results)
+    else:
+        places = _fetch_places_raw(
+            encoded_polyline, query, api_key, _api_key_digest(api_key), min(max_results, PLACES_PAGE_SIZE)
+        )
+
+    # Calculate distance from route for all located places in one pass
+    distances = [None] * len(places)
+    if route_index is not None:
+        located = [
+            (i, place["location"]["latitude"], place["location"]["longitude"])
+            for i, place in enumerate(places)
+            if place.get("location", {}).get("latitude") and place.get("location", {}).get("longitude")
+        ]
+        if located:
+            min_m = distances_from_route(np.array([(lat, lon) for _, lat, lon in located]), route_index)
+            for (i, _, _), dist in zip(located, min_m):
+                distances[i] = float(dist)
 
     results = []
-    for place in places:
+    for place, dist_from_route in zip(places, distances):
         location = place.get("location", {})
         lat = location.get("latitude")
         lon = location.get("longitude")
 
-        # Calculate distance from route
-        dist_from_route = None
-        if route_points and lat and lon:
-            dist_from_route = distance_from_route(lat, lon, route_points)
-
-        # Parse price level to number of $ signs
-        price_raw = place.get("priceLevel", "")
-        price_map = {
-            "PRICE_LEVEL_FREE": "Free",
-            "PRICE_LEVEL_INEXPENSIVE": "$",
-            "PRICE_LEVEL_MODERATE": "$$",
-            "PRICE_LEVEL_EXPENSIVE": "$$$",
-            "PRICE_LEVEL_VERY_EXPENSIVE": "$$$$"
-        }
-        price_display = price_map.get(price_raw, "")
-
-        # Get open now status
-        opening_hours = place.get("currentOpeningHours", {})
-        open_now = opening_hours.get("openNow")
-
-        # Google Maps URL - use Place ID for direct business listing
-        place_id = place.get("id", "")
-        if place_id:
-            maps_url = f"https://www.google.com/maps/place/?q=place_id:{place_id}"
-        elif lat and lon:
-            maps_url = f"https://www.google.com/maps/search/?api=1&query={lat},{lon}"
-        else:
-            maps_url = ""
-
         results.append({
+            "id": place.get("id", ""),
             "name": place.get("displayName", {}).get("text", "Unknown"),
             "address": place.get("formattedAddress", ""),
             "rating": place.get("rating"),
@@ -212,23 +469,66 @@ def search_along_route(
             "lat": lat,
             "lon": lon,
             "types": ", ".join(place.get("types", [])[:3]),
-            "price_level": price_display,
-            "price_raw": price_raw,
-            "open_now": open_now,
-            "distance_m": dist_from_route,
-            "distance_mi": dist_from_route / 1609.34 if dist_from_route else None,
-            "distance_display": f"{dist_from_route / 1609.34:.1f} mi" if dist_from_route else "",
-            "maps_url": maps_url
+            "price_raw": place.get("priceLevel", ""),
+            "open_now": place.get("currentOpeningHours", {}).get("openNow"),
+            "distance_m": dist_from_route
         })
 
     return results
 
 
+def build_results_frame(results: list[dict]) -> pd.DataFrame:
+    """Build the results table, adding display columns in one vectorized pass.
+
+    Adds price_level, distance_mi, distance_display, maps_url, plus the
+    popup_html and tooltip used for map markers.
+    """
+    df = pd.DataFrame(results, columns=[
+        "id", "name", "address", "rating", "rating_count", "lat", "lon",
+        "types", "price_raw", "open_now", "distance_m"
+    ])
+
+    df["price_level"] = df["price_raw"].map(PRICE_LEVELS).fillna("").astype(str)
+
+    # Distance from route in miles
+    df["distance_mi"] = pd.to_numeric(df["distance_m"], errors="coerce") / 1609.34
+    df["distance_display"] = df["distance_mi"].map(lambda x: f"{x:.1f} mi" if pd.notna(x) else "").astype(str)
+
+    # Google Maps URL - use Place ID for direct business listing, else coordinates
+    place_id = df["id"].fillna("").astype(str)
+    located = df["lat"].notna() & df["lon"].notna()
+    search_url = "https://www.google.com/maps/search/?api=1&query=" + df["lat"].astype(str) + "," + df["lon"].astype(str)
+    df["maps_url"] = ("https://www.google.com/maps/place/?q=place_id:" + place_id).where(
+        place_id != "", search_url.where(located, "")
+    )
+
+    # Marker popup and tooltip text
+    rating_str = df["rating"].map(lambda r: f"{r:.1f}" if pd.notna(r) and r else "N/A").astype(str)
+    price_str = (" · " + df["price_level"]).where(df["price_level"] != "", "")
+    open_str = pd.Series(" · Open", index=df.index).where(df["open_now"].eq(True), "")
+    distance_str = ("<br>" + df["distance_display"] + " from route").where(df["distance_display"] != "", "")
+    name = df["name"].astype(str)
+    df["popup_html"] = (
+        "<b>" + name + "</b><br>Rating: " + rating_str + price_str + open_str + distance_str
+        + "<br><small>" + df["address"].fillna("").astype(str) + "</small><br>"
+        + '<a href="' + df["maps_url"] + '" target="_blank" style="color: #1a73e8;">Open in Google Maps</a>'
+    )
+    df["tooltip"] = name + " (" + rating_str + ")"
+
+    return df
+
+
 def generate_map(
-    route_points: list[tuple[float, float]],
-    places: Optional[list[dict]] = None
+    route_points: Optional[np.ndarray],
+    places: Optional[pd.DataFrame] = None
 ) -> folium.Map:
-    """Create folium map with route polyline and place markers."""
+    """Create folium map with route polyline and place markers.
+
+    places is a frame from build_results_frame.
+    """
+    # folium wants plain lists, so convert once at the boundary
+    route_points = route_points.tolist() if route_points is not None else []
+
     if not route_points:
         # Default to Austin if no points
         center = [30.2672, -97.7431]
@@ -236,7 +536,7 @@ def generate_map(
     else:
         # Center on route midpoint
         mid_idx = len(route_points) // 2
-        center = list(route_points[mid_idx])
+        center = route_points[mid_idx]
         zoom = 12
 
     m = folium.Map(location=center, zoom_start=zoom)
@@ -264,38 +564,39 @@ def generate_map(
             tooltip="End"
         ).add_to(m)
 
-    # Add place markers
-    if places:
-        for place in places:
-            if place.get("lat") and place.get("lon"):
-                # Build popup content
-                rating_str = f"{place['rating']:.1f}" if place.get('rating') else "N/A"
-                price_str = f" · {place['price_level']}" if place.get('price_level') else ""
-                distance_str = f"<br>{place['distance_display']} from route" if place.get('distance_display') else ""
-                open_str = " · Open" if place.get('open_now') else ""
-
-                # Google Maps link - use stored URL which has place ID
-                maps_url = place.get("maps_url", f"https://www.google.com/maps/search/?api=1&query={place['lat']},{place['lon']}")
-
-                popup_html = f"""
-                <b>{place['name']}</b><br>
-                Rating: {rating_str}{price_str}{open_str}{distance_str}<br>
-                <small>{place.get('address', '')}</small><br>
-                <a href="{maps_url}" target="_blank" style="color: #1a73e8;">Open in Google Maps</a>
-                """
-
-                folium.Marker(
-                    location=[place["lat"], place["lon"]],
-                    icon=folium.Icon(color="orange", icon="info-sign"),
-                    popup=folium.Popup(popup_html, max_width=300),
-                    tooltip=f"{place['name']} ({rating_str})"
-                ).add_to(m)
+    # Add place markers, clustered client-side so dense results stay fast to draw
+    if places is not None:
+        places = places[places["lat"].notna() & places["lon"].notna()]
+        cluster = MarkerCluster(options={"disableClusteringAtZoom": 15}).add_to(m)
+        for place in places.itertuples(index=False):
+            # SVG circle rather than an icon marker - no image assets to load per place
+            folium.CircleMarker(
+                location=[place.lat, place.lon],
+                radius=6,
+                color="#ff8c00",
+                fill=True,
+                fill_opacity=0.9,
+                popup=folium.Popup(place.popup_html, max_width=300),
+                tooltip=place.tooltip
+            ).add_to(cluster)
 
     # Fit map bounds to show all markers
     if route_points:
         all_points = list(route_points)
-        if places:
-            all_points.extend([(p["lat"], p["lon"]) for p in places if p.get("lat")])
+        if places is not None:
+            all_points.extend(places[["lat", "lon"]].to_numpy().tolist())
         m.fit_bounds(all_points)
 
     return m
+
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def generate_map_cached(
+    route_points: Optional[np.ndarray],
+    places: Optional[pd.DataFrame] = None
+) -> folium.Map:
+    """Cached generate_map, keyed on the route array and places frame contents.
+
+    Reruns that leave the route and filtered places unchanged reuse the map.
+    """
+    return generate_map(route_points, places)